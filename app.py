@@ -24,12 +24,56 @@ Formula source map:
   input!E21      → CO2 log = LOG(0.000426)
 """
 
+import functools
+import importlib
 import math
+import multiprocessing
+import operator
+import os
+import threading
 import traceback
-from flask import Flask, render_template, request, jsonify
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from flask import (Flask, Response, abort, render_template, request, jsonify,
+                   stream_with_context)
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None   # stdlib json fallback — slower but functionally identical
+
+try:
+    import numba
+except ImportError:
+    numba = None    # optional: the NumPy paths below are used instead
 
 app = Flask(__name__)
 
+
+class _OrjsonProvider(JSONProvider):
+    """orjson-backed jsonify: C-level serialization with native float and
+    NumPy handling, ~5× faster than the stdlib dict walk."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the Response — the base class
+        # would decode to str only for Werkzeug to re-encode to UTF-8.
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+            mimetype='application/json')
+
+
+if orjson is not None:
+    app.json = _OrjsonProvider(app)
+
 # ── Atomic weights  (hidden!Q3:Q13) ──────────────────────────────────────────
 Q3  = 22.989769   # Na
 Q4  = 39.0983     # K
@@ -57,6 +101,16 @@ D17 = 74.55                   # KCl    (always anhydrous, hidden!D17 is constant
 CO2_LOG = math.log10(0.000426)   # input!E21 = LOG(0.000426) = -3.370590401
 RF = 200                          # hidden!C23  relative factor for REACTION amounts
 
+# ── Hydratable-salt tables  (hidden!D12/D13/D15/D18 selects) ─────────────────
+# Fixed order: MgCl2, CaCl2, MgSO4, Na2SO4.  Built once at import so the
+# recipe hot path does a vector select instead of rebuilding dicts/branches.
+SALT_NAMES       = ('MgCl2', 'CaCl2', 'MgSO4', 'Na2SO4')
+MW_ANH           = np.array([J3, J6, J9, J12])    # anhydrous molar masses
+MW_HYD           = np.array([J4, J7, J10, J13])   # hydrated molar masses
+HYDRATION_WATERS = np.array([6.0, 2.0, 7.0, 10.0])   # hidden!G18:G21
+ANHYDROUS_LABELS = ('MgCl₂', 'CaCl₂', 'MgSO₄', 'Na₂SO₄')
+HYDRATED_LABELS  = ('MgCl₂·6H₂O', 'CaCl₂·2H₂O', 'MgSO₄·7H₂O', 'Na₂SO₄·10H₂O')
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # WATER MASS  (hidden!M10)
@@ -82,6 +136,50 @@ def to_mmol_kgw(mg_per_L, MW, water_mass):
     return mg_per_L / water_mass / MW
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# SALT VECTOR  (hidden!A15, A18, C12:C18)
+# Shared by build_recipe and build_phreeqc_input, which previously both
+# recomputed this block from the ion dict.
+# ─────────────────────────────────────────────────────────────────────────────
+def _salt_kernel(C3, C4, C5, C6, C7, C8):
+    """Pure-scalar core of salt_mmol — float64 in, fixed-shape tuple out,
+    so Numba can lower it when installed (see below)."""
+    # Flags  (hidden!A18, A15)
+    A18 = 1.0 if C8 > C6 else 0.0
+    A15 = 1.0 - A18
+
+    return (max(0.0, C6 - C8 * A15),        # C12 MgCl2
+            max(0.0, C7),                    # C13 CaCl2
+            max(0.0, C5),                    # C14 LiCl
+            max(0.0, C8) * A15,              # C15 MgSO4  (0 when Na2SO4 path)
+            max(0.0, C3 - 2 * C8 * A18),    # C16 NaCl
+            max(0.0, C4),                    # C17 KCl
+            max(0.0, C8) * A18,              # C18 Na2SO4 (0 when MgSO4 path)
+            A18, A15)
+
+
+if numba is not None:
+    _salt_kernel = numba.njit(cache=True)(_salt_kernel)
+
+
+def salt_mmol(ion_mmol_kgw):
+    """Salt mmol/kgw vector (hidden!C12:C18) plus the SO4-path flags.
+
+    ion_mmol_kgw is the positional ion array from parse_payload (ION_KEYS
+    order).  Returns (C, A18, A15) where C = [MgCl2, CaCl2, LiCl, MgSO4,
+    NaCl, KCl, Na2SO4] and A18/A15 select the Na2SO4 vs MgSO4 path.
+    """
+    *C, A18, A15 = _salt_kernel(
+        ion_mmol_kgw[NA],   # hidden!C3
+        ion_mmol_kgw[K],    # hidden!C4
+        ion_mmol_kgw[LI],   # hidden!C5
+        ion_mmol_kgw[MG],   # hidden!C6
+        ion_mmol_kgw[CA],   # hidden!C7
+        ion_mmol_kgw[SO4],  # hidden!C8
+    )
+    return np.array(C), int(A18), int(A15)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # BUFFER RECIPE  (hidden!B12:E18, data!E26:E32, hidden!I17)
 #
@@ -114,31 +212,34 @@ def to_mmol_kgw(mg_per_L, MW, water_mass):
 # ─────────────────────────────────────────────────────────────────────────────
 def build_recipe(ion_mmol_kgw, hydration):
     """
-    ion_mmol_kgw : {Na, K, Li, Mg, Ca, SO4}  in mmol/kgw
+    ion_mmol_kgw : float64 array in ION_KEYS order (Na,K,Li,Mg,Ca,SO4), mmol/kgw
     hydration    : {MgCl2:'Hexahydrate'/'Anhydrous',
                     CaCl2:'Anhydrous'/'Dihydrate',
                     MgSO4:'Heptahydrate'/'Anhydrous',
                     Na2SO4:'Anhydrous'/'Decahydrate'}
+
+    Pure function of its inputs, and the UI re-posts near-identical
+    payloads on every form change — so results are memoized on a
+    hashable (salts, hydration) key.
     """
-    C3 = ion_mmol_kgw['Na']   # hidden!C3
-    C4 = ion_mmol_kgw['K']    # hidden!C4
-    C5 = ion_mmol_kgw['Li']   # hidden!C5
-    C6 = ion_mmol_kgw['Mg']   # hidden!C6
-    C7 = ion_mmol_kgw['Ca']   # hidden!C7
-    C8 = ion_mmol_kgw['SO4']  # hidden!C8
+    return recipe_from_salts(salt_mmol(ion_mmol_kgw)[0], hydration)
 
-    # Flags  (hidden!A18, A15)
-    A18 = 1 if C8 > C6 else 0
-    A15 = 0 if A18 == 1 else 1
+
+def recipe_from_salts(salts, hydration):
+    """Recipe table from an already-computed hidden!C12:C18 salt vector.
+
+    /calculate reuses the vector built for the PHREEQC input here, so the
+    salt math runs once per request instead of twice.
+    """
+    return _recipe_from_salts(tuple(salts), tuple(sorted(hydration.items())))
+
+
+@functools.lru_cache(maxsize=256)
+def _recipe_from_salts(salt_items, hyd_items):
+    hydration = dict(hyd_items)
 
     # Salt mmol/kgw  (hidden!C12:C18)
-    C12 = max(0.0, C6 - C8 * A15)        # MgCl2
-    C13 = max(0.0, C7)                    # CaCl2
-    C14 = max(0.0, C5)                    # LiCl
-    C15 = max(0.0, C8) * A15             # MgSO4  (0 when Na2SO4 path)
-    C16 = max(0.0, C3 - 2 * C8 * A18)   # NaCl
-    C17 = max(0.0, C4)                    # KCl
-    C18 = max(0.0, C8) * A18             # Na2SO4 (0 when MgSO4 path)
+    C12, C13, C14, C15, C16, C17, C18 = salt_items
 
     # Salt MW based on hydration choice  (hidden!D12:D18)
     # Exact match against the dropdown option values in the UI:
@@ -146,13 +247,10 @@ def build_recipe(ion_mmol_kgw, hydration):
     #   CaCl2:  'Anhydrous' → J6=110.984  | 'Dihydrate'    → J7=147.015
     #   MgSO4:  'Anhydrous' → J9=120.366  | 'Heptahydrate' → J10=246.472
     #   Na2SO4: 'Anhydrous' → J12=142.04  | 'Heptahydrate' → J13=322.2 (10H2O in Excel)
-    def is_anhydrous(salt_key):
-        return hydration.get(salt_key, 'Anhydrous') == 'Anhydrous'
-
-    D12 = J3  if is_anhydrous('MgCl2')  else J4    # anhydrous → J3, hexahydrate  → J4
-    D13 = J6  if is_anhydrous('CaCl2')  else J7    # anhydrous → J6, dihydrate    → J7
-    D15 = J9  if is_anhydrous('MgSO4')  else J10   # anhydrous → J9, heptahydrate → J10
-    D18 = J12 if is_anhydrous('Na2SO4') else J13   # anhydrous → J12, heptahydrate → J13
+    # One vector select over the module tables replaces four if/else pairs.
+    is_anh = np.array([hydration.get(s, 'Anhydrous') == 'Anhydrous'
+                       for s in SALT_NAMES])
+    D12, D13, D15, D18 = np.where(is_anh, MW_ANH, MW_HYD).tolist()
 
     # g/kgw  (hidden!E12:E18)
     E12 = D12 * C12 / 1000
@@ -164,19 +262,12 @@ def build_recipe(ion_mmol_kgw, hydration):
     E18 = D18 * C18 / 1000
 
     # Hydration water (hidden!I18:I21, J18:J21, I17)
-    # J18 = IF(data!C26="MgCl₂", 0, 1)  → 0 when anhydrous (name is plain MgCl₂)
-    J18 = 0 if is_anhydrous('MgCl2')  else 1
-    J19 = 0 if is_anhydrous('CaCl2')  else 1
-    J20 = 0 if is_anhydrous('MgSO4')  else 1
-    J21 = 0 if is_anhydrous('Na2SO4') else 1
-
-    I18 = C12 * 6  * Q10 / 1000   # hidden!I18 = C12*G18*Q10/1000
-    I19 = C13 * 2  * Q10 / 1000   # hidden!I19
-    I20 = C15 * 7  * Q10 / 1000   # hidden!I20
-    I21 = C18 * 10 * Q10 / 1000   # hidden!I21 = G21*C18*Q10/1000
+    # J18:J21 flags are 1 when the hydrated form is chosen; hidden!Ix =
+    # Cx*Gx*Q10/1000 with Gx from HYDRATION_WATERS, summed in one dot product.
+    hyd_water_g = np.array([C12, C13, C15, C18]) * HYDRATION_WATERS * Q10 / 1000
 
     I16 = 1000.0   # hidden!I16 = 1000 g water base
-    I17 = I16 - J18*I18 - J19*I19 - J20*I20 - J21*I21   # remaining H2O g
+    I17 = I16 - float((~is_anh @ hyd_water_g))   # remaining H2O g
 
     # data!J33 = hidden!I17/hidden!Q10   (mmol H2O)
     # data!K33 = hidden!I17              (g H2O)
@@ -184,21 +275,23 @@ def build_recipe(ion_mmol_kgw, hydration):
     water_mmol = water_g / Q10
 
     # Dynamic salt names mirror data!C26:C32 — IF(E26="Anhydrous", plain, hydrated)
-    n_MgCl2  = 'MgCl₂'        if is_anhydrous('MgCl2')  else 'MgCl₂·6H₂O'
-    n_CaCl2  = 'CaCl₂'        if is_anhydrous('CaCl2')  else 'CaCl₂·2H₂O'
-    n_MgSO4  = 'MgSO₄'        if is_anhydrous('MgSO4')  else 'MgSO₄·7H₂O'
-    n_Na2SO4 = 'Na₂SO₄'   if is_anhydrous('Na2SO4') else 'Na₂SO₄·10H₂O'
-
-    return {
-        n_MgCl2:  {'mmol': round(C12, 4), 'g': round(E12, 4), 'mw': round(D12, 3)},
-        n_CaCl2:  {'mmol': round(C13, 4), 'g': round(E13, 4), 'mw': round(D13, 3)},
-        'LiCl':   {'mmol': round(C14, 4), 'g': round(E14, 4), 'mw': round(D14, 3)},
-        n_MgSO4:  {'mmol': round(C15, 4), 'g': round(E15, 4), 'mw': round(D15, 3)},
-        'NaCl':   {'mmol': round(C16, 4), 'g': round(E16, 4), 'mw': round(D16, 3)},
-        'KCl':    {'mmol': round(C17, 4), 'g': round(E17, 4), 'mw': round(D17, 3)},
-        n_Na2SO4: {'mmol': round(C18, 4), 'g': round(E18, 4), 'mw': round(D18, 3)},
-        'H₂O': {'mmol': round(water_mmol, 2), 'g': round(water_g, 2), 'mw': round(Q10, 3)},
+    n_MgCl2, n_CaCl2, n_MgSO4, n_Na2SO4 = \
+        np.where(is_anh, ANHYDROUS_LABELS, HYDRATED_LABELS).tolist()
+
+    # One vectorized rounding pass instead of ~30 scalar round() calls
+    # (np.round is round-half-even, same as the builtin).
+    names = (n_MgCl2, n_CaCl2, 'LiCl', n_MgSO4, 'NaCl', 'KCl', n_Na2SO4)
+    mmol  = np.round(np.array([C12, C13, C14, C15, C16, C17, C18]), 4)
+    g     = np.round(np.array([E12, E13, E14, E15, E16, E17, E18]), 4)
+    mw    = np.round(np.array([D12, D13, D14, D15, D16, D17, D18]), 3)
+
+    recipe = {
+        nm: {'mmol': m, 'g': gg, 'mw': w}
+        for nm, m, gg, w in zip(names, mmol.tolist(), g.tolist(), mw.tolist())
     }
+    recipe['H₂O'] = {'mmol': round(water_mmol, 2), 'g': round(water_g, 2),
+                      'mw': round(Q10, 3)}
+    return recipe
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -221,25 +314,79 @@ def build_recipe(ion_mmol_kgw, hydration):
 # NaOH steps  (input!E50 = data!J19/data!J20 = NaOH_vol/(NaOH_vol/20) = 20)
 # H3BO3 H2O  (input!C40 = 55.5556/data!J15)
 # NaOH  H2O  (input!C49 = 55.5556/data!J18)
+#
+# The scaffolding (SELECTED_OUTPUT / USER_PUNCH / SOLUTION headers) never
+# changes, so it is compiled once at import into a bound .format template;
+# per request only the ~12 dynamic fields are interpolated.  f-string lines
+# below hold constants and are folded at import time.
 # ─────────────────────────────────────────────────────────────────────────────
+_PQI_TEMPLATE = (
+    "SELECTED_OUTPUT 1\n"
+    "-molalities\tB(OH)3  B(OH)4- \n"
+    "\tB3O3(OH)4-  B4O5(OH)4-2  MgB(OH)4+  CaB(OH)4+\n"
+    "-ionic_strength       \ttrue\n"
+    "-pH\ttrue\n"
+    "-user_punch\ttrue\n"
+    "-water\ttrue\n"
+    "-alkalinity\ttrue\n"
+    "USER_PUNCH \t1\n"
+    "-headings \tVolume Density\n"
+    "-start\n"
+    "10\tPUNCH SOLN_VOL\n"
+    "20\tPUNCH RHO\n"
+    "30\tEND\n"
+    "SOLUTION\t1\n"
+    "\ttemp\t20\n"
+    "\tpH\t7\n"
+    "\tpe\t4\n"
+    "\tredox\tpe\n"
+    "\tunits\tmol/l\n"
+    f"\tC(4)\t1\tCO2(g)\t{CO2_LOG:.9f}\n"
+    "\t-water\t1\t#\tkg\n"
+    "\n"
+    "REACTION\t1\n"
+    "\tMgCl2\t{mgcl2}\n"   # hidden!S3 / (C12/B33)
+    "\tCaCl2\t{cacl2}\n"   # hidden!S4
+    "\tLiCl\t{licl}\n"     # hidden!S5
+    "\tMgSO4\t{mgso4}\n"   # hidden!S6
+    "\tNaCl\t{nacl}\n"     # hidden!S7
+    "\tKCl\t{kcl}\n"       # hidden!S8
+    "\tNa2SO4\t{na2so4}\n" # hidden!S9
+    "\n"
+    f"\t{RF}\tmillimoles\tin \t1\tsteps\n"
+    "SAVE\tSolution\t1\n"
+    "END\n"
+    "USE\tSolution\t1\n"
+    "\n"
+    "REACTION\t2\n"
+    "\tH3BO3\t1\n"
+    "\tH2O\t{h3bo3_h2o:.3f}\n"
+    "\t{m7:.8f}\tmillimoles\tin \t1\tsteps\n"
+    "\n"
+    "SAVE\tSolution\t1\n"
+    "END\n"
+    "USE\tSolution\t1\n"
+    "\n"
+    "REACTION\t2\n"
+    "\tNaOH\t1\n"
+    "\tH2O\t{naoh_h2o:.4f}\n"
+    "\t{m8:.8f}\tmillimoles\tin \t{n_steps}\tsteps\n"
+    "\n"
+).format
+
+
+def _fmt_reaction_amount(val):
+    """input!C25:C31 — salt mmol/kgw over the RF relative factor, 9 dp."""
+    return f"{val / RF:.9f}"
+
+
 def build_phreeqc_input(ion_mmol_kgw, params, water_mass):
-    C3 = ion_mmol_kgw['Na']
-    C4 = ion_mmol_kgw['K']
-    C5 = ion_mmol_kgw['Li']
-    C6 = ion_mmol_kgw['Mg']
-    C7 = ion_mmol_kgw['Ca']
-    C8 = ion_mmol_kgw['SO4']
-
-    A18 = 1 if C8 > C6 else 0
-    A15 = 0 if A18 == 1 else 1
-
-    C12 = max(0.0, C6 - C8 * A15)
-    C13 = max(0.0, C7)
-    C14 = max(0.0, C5)
-    C15 = max(0.0, C8) * A15
-    C16 = max(0.0, C3 - 2 * C8 * A18)
-    C17 = max(0.0, C4)
-    C18 = max(0.0, C8) * A18
+    """Returns (pqi, n_steps, salts); salts is the hidden!C12:C18 vector,
+    handed back so /calculate can feed recipe_from_salts without redoing
+    the salt math."""
+    # Salt mmol/kgw  (hidden!C12:C18) — same vector the recipe uses
+    salts = salt_mmol(ion_mmol_kgw)[0]
+    C12, C13, C14, C15, C16, C17, C18 = salts
 
     # data!J15:J20
     H3BO3_conc = params['H3BO3_conc']   # J15
@@ -265,105 +412,80 @@ def build_phreeqc_input(ion_mmol_kgw, params, water_mass):
     # input!E50 = data!J19 / data!J20 = NaOH_vol / (NaOH_vol/20) = 20
     n_steps = 20
 
-    def r(val):
-        return f"{val / RF:.9f}"
-
-    pqi = (
-        "SELECTED_OUTPUT 1\n"
-        "-molalities\tB(OH)3  B(OH)4- \n"
-        "\tB3O3(OH)4-  B4O5(OH)4-2  MgB(OH)4+  CaB(OH)4+\n"
-        "-ionic_strength       \ttrue\n"
-        "-pH\ttrue\n"
-        "-user_punch\ttrue\n"
-        "-water\ttrue\n"
-        "-alkalinity\ttrue\n"
-        "USER_PUNCH \t1\n"
-        "-headings \tVolume Density\n"
-        "-start\n"
-        "10\tPUNCH SOLN_VOL\n"
-        "20\tPUNCH RHO\n"
-        "30\tEND\n"
-        "SOLUTION\t1\n"
-        "\ttemp\t20\n"
-        "\tpH\t7\n"
-        "\tpe\t4\n"
-        "\tredox\tpe\n"
-        "\tunits\tmol/l\n"
-        f"\tC(4)\t1\tCO2(g)\t{CO2_LOG:.9f}\n"
-        "\t-water\t1\t#\tkg\n"
-        "\n"
-        "REACTION\t1\n"
-        f"\tMgCl2\t{r(C12)}\n"   # hidden!S3 / (C12/B33)
-        f"\tCaCl2\t{r(C13)}\n"   # hidden!S4
-        f"\tLiCl\t{r(C14)}\n"    # hidden!S5
-        f"\tMgSO4\t{r(C15)}\n"   # hidden!S6
-        f"\tNaCl\t{r(C16)}\n"    # hidden!S7
-        f"\tKCl\t{r(C17)}\n"     # hidden!S8
-        f"\tNa2SO4\t{r(C18)}\n"  # hidden!S9
-        "\n"
-        f"\t{RF}\tmillimoles\tin \t1\tsteps\n"
-        "SAVE\tSolution\t1\n"
-        "END\n"
-        "USE\tSolution\t1\n"
-        "\n"
-        "REACTION\t2\n"
-        "\tH3BO3\t1\n"
-        f"\tH2O\t{H3BO3_H2O:.3f}\n"
-        f"\t{M7:.8f}\tmillimoles\tin \t1\tsteps\n"
-        "\n"
-        "SAVE\tSolution\t1\n"
-        "END\n"
-        "USE\tSolution\t1\n"
-        "\n"
-        "REACTION\t2\n"
-        "\tNaOH\t1\n"
-        f"\tH2O\t{NaOH_H2O:.4f}\n"
-        f"\t{M8:.8f}\tmillimoles\tin \t{n_steps}\tsteps\n"
-        "\n"
+    r = _fmt_reaction_amount
+    pqi = _PQI_TEMPLATE(
+        mgcl2=r(C12), cacl2=r(C13), licl=r(C14), mgso4=r(C15),
+        nacl=r(C16), kcl=r(C17), na2so4=r(C18),
+        h3bo3_h2o=H3BO3_H2O, m7=M7, naoh_h2o=NaOH_H2O, m8=M8,
+        n_steps=n_steps,
     )
 
-    return pqi, n_steps
+    return pqi, n_steps, salts
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # DATABASE FINDER
 # ─────────────────────────────────────────────────────────────────────────────
+def _walk_for_file(root, filename):
+    """First match of filename under root, stopping at the first hit
+    (recursive glob materializes the whole tree before returning)."""
+    for dirpath, _dirs, files in os.walk(root):
+        if filename in files:
+            return os.path.join(dirpath, filename)
+    return None
+
+
+@functools.lru_cache(maxsize=16)
 def find_database(db_filename):
-    import os, glob
+    """Resolve a PHREEQC database file to an absolute path.
 
+    The search walks Program Files and the phreeqpy package tree —
+    thousands of stat() calls — so results are memoized per filename
+    for the life of the process.
+    """
     app_dir = os.path.dirname(os.path.abspath(__file__))
     p = os.path.join(app_dir, db_filename)
     if os.path.isfile(p):
         return p
 
     for root in [r"C:\Program Files\USGS", r"C:\Program Files (x86)\USGS"]:
-        for m in glob.glob(os.path.join(root, '**', db_filename), recursive=True):
+        m = _walk_for_file(root, db_filename)
+        if m:
             return m
 
-    try:
-        import phreeqpy
-        pkg = os.path.dirname(phreeqpy.__file__)
-        for m in glob.glob(os.path.join(pkg, '**', db_filename), recursive=True):
-            return m
-    except Exception:
-        pass
+    # Bundled databases: phreeqpython ships the standard set, phreeqpy may too
+    for pkg_name in ('phreeqpython', 'phreeqpy'):
+        try:
+            pkg = importlib.import_module(pkg_name)
+            m = _walk_for_file(os.path.dirname(pkg.__file__), db_filename)
+            if m:
+                return m
+        except Exception:
+            pass
 
     return os.path.join(app_dir, db_filename)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # IPHREEQC RUNNER
+#
+# Engine init + pitzer.dat parse cost O(100 ms – seconds); paying that on
+# every /calculate dwarfed the actual titration solve.  We therefore keep ONE
+# PhreeqPython instance per worker process, built lazily on first use (never
+# at import — the C handle must not cross a gunicorn fork()).  Each input
+# string redefines SOLUTION 1 and SELECTED_OUTPUT 1, so runs overwrite the
+# previous state and no explicit reset is needed between them.
 # ─────────────────────────────────────────────────────────────────────────────
-def run_phreeqc(pqi):
-    """
-    Run PHREEQC input string using phreeqpython (Linux-compatible, no DLL needed).
+_PP = None                      # per-worker PhreeqPython singleton
+_PP_LOCK = threading.Lock()     # run_string is not re-entrant on one instance
 
-    phreeqpython wraps VIPhreeqc via pp.ip — same underlying engine as your
-    Windows IPhreeqcCOM, so results are identical.
+# Selected-output columns that hold text; everything else (pH, mu, m_*,
+# soln, step, the USER_PUNCH fields, …) parses as float64.
+_TEXT_COLS = frozenset({'state'})
 
-    Database: pitzer.dat is bundled inside phreeqpython's package on Linux.
-    We locate it automatically via the package's own database path.
-    """
+
+def _init_phreeqpython():
+    """Build the singleton: import phreeqpython and load pitzer.dat once."""
     try:
         from phreeqpython import PhreeqPython
     except ImportError as _e:
@@ -372,58 +494,123 @@ def run_phreeqc(pqi):
             "Run: pip install phreeqpython"
         )
 
-    # Locate pitzer.dat — phreeqpython bundles all standard PHREEQC databases
-    import os, glob
-    db_path = None
-
-    # 1. App folder (allows override)
-    app_dir  = os.path.dirname(os.path.abspath(__file__))
-    candidate = os.path.join(app_dir, 'pitzer.dat')
-    if os.path.isfile(candidate):
-        db_path = candidate
+    # Locate pitzer.dat — cached resolver covers the app folder (override),
+    # USGS installs and the bundled package databases
+    db_path = find_database('pitzer.dat')
 
-    # 2. phreeqpython bundled databases
-    if not db_path:
-        try:
-            import phreeqpython as _pp
-            pkg_dir = os.path.dirname(_pp.__file__)
-            for match in glob.glob(os.path.join(pkg_dir, '**', 'pitzer.dat'), recursive=True):
-                db_path = match
-                break
-        except Exception:
-            pass
-
-    if not db_path:
+    if not os.path.isfile(db_path):
         # Last resort: let phreeqpython use its default (no explicit path)
         try:
-            pp = PhreeqPython()  # uses built-in default database path
-            # Test it loaded something
-            db_path = "default"
+            return PhreeqPython()  # uses built-in default database path
         except Exception as _e2:
             raise RuntimeError(
                 f"Could not find pitzer.dat and PhreeqPython() default also failed: {_e2}\n"
                 "Reinstall: pip install phreeqpython"
             )
 
-    # Initialise with pitzer.dat
-    if db_path != "default":
-        try:
-            pp = PhreeqPython(database=db_path)
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialise PhreeqPython with {db_path}:\n{e}")
-    # else: pp already initialised above with default database
+    try:
+        return PhreeqPython(database=db_path)
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialise PhreeqPython with {db_path}:\n{e}")
+
+
+def _get_phreeqpython():
+    global _PP
+    if _PP is None:
+        with _PP_LOCK:
+            if _PP is None:
+                _PP = _init_phreeqpython()
+    return _PP
+
+
+# Opt-in eager init: with PHREEQC_PRELOAD=1 each gunicorn worker pays the
+# engine + pitzer.dat load at boot instead of on its first /calculate.
+# Stays opt-in so the app still imports on machines without phreeqpython.
+if os.environ.get('PHREEQC_PRELOAD') == '1':
+    _get_phreeqpython()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SOLVE POOL  (/calculate_batch)
+#
+# One PHREEQC solve holds _PP_LOCK for its duration, so a parameter sweep of
+# N samples through /calculate is O(N × solve).  Batch callers instead fan
+# out over a lazily-created process pool — each child owns its own engine +
+# database singleton, giving O(N/cores × solve).  Single /calculate keeps
+# using the in-process singleton.
+# ─────────────────────────────────────────────────────────────────────────────
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_worker_init():
+    try:
+        _get_phreeqpython()  # one engine + pitzer.dat per child, built at start
+    except Exception:
+        pass                 # surfaced per payload by _solve_one instead
+
+
+def _get_pool():
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                # spawn, not fork: under gthread workers a sibling thread may
+                # hold _PP_LOCK mid-solve when the pool starts, and a forked
+                # child would inherit that lock permanently held (its owner
+                # thread doesn't exist in the child) — deadlocking the batch.
+                # Spawned children also start without the parent's live
+                # PHREEQC C handle, which must not cross process boundaries.
+                _POOL = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_pool_worker_init)
+    return _POOL
+
+
+def _solve_one(payload_key):
+    """Full response for one canonical payload; runs inside a pool child."""
+    try:
+        return _calculate_response(payload_key)
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def run_phreeqc(pqi):
+    """
+    Run PHREEQC input string using phreeqpython (Linux-compatible, no DLL needed).
+
+    phreeqpython wraps VIPhreeqc via pp.ip — same underlying engine as your
+    Windows IPhreeqcCOM, so results are identical.
+
+    The engine + database singleton is shared across requests; only the
+    run_string + output fetch happen per call (under _PP_LOCK).
+
+    Returns the selected output in columnar (SoA) form: a dict mapping
+    header → np.ndarray(float64) for numeric columns, or a list of str
+    for text columns ('state', …).  Row order is preserved.
+    """
+    pp = _get_phreeqpython()
+
+    # Input-string visibility without the legacy per-request stdout dump:
+    # routed through the Flask logger and only when debugging, so production
+    # workers never pay for the formatting or the write.
+    if app.debug:
+        app.logger.debug("PHREEQC input:\n%s", pqi)
 
     # Run the input string via pp.ip (the raw VIPhreeqc interface)
     try:
-        pp.ip.run_string(pqi)
+        with _PP_LOCK:
+            pp.ip.run_string(pqi)
+            arr    = pp.ip.get_selected_output_array()
+            n_rows = pp.ip.row_count
+            n_cols = pp.ip.column_count
+    except RuntimeError:
+        raise
     except Exception as e:
         raise RuntimeError(f"PHREEQC simulation error:\n{e}")
 
-    # Parse selected output — returns a 2-D list, row 0 = headers
-    arr    = pp.ip.get_selected_output_array()
-    n_rows = pp.ip.row_count
-    n_cols = pp.ip.column_count
-
+    # Parse selected output — arr is a 2-D list, row 0 = headers
     if n_rows < 2:
         raise RuntimeError(
             "PHREEQC returned no output rows.\n"
@@ -431,53 +618,128 @@ def run_phreeqc(pqi):
         )
 
     headers = [str(arr[0][c]) for c in range(n_cols)]
+    data    = arr[1:]
+    n       = n_rows - 1
+
+    # Column-wise conversion: one C-level np.fromiter per numeric column
+    # instead of a Python try/except around every cell.  Known-text columns
+    # are routed by header name so no exception fires at all; anything else
+    # unexpected still falls back to str on the first failed cast.
+    cols = {}
+    for c in range(n_cols):
+        name = headers[c]
+        if name in _TEXT_COLS:
+            cols[name] = [str(row[c]) for row in data]
+            continue
+        try:
+            cols[name] = np.fromiter((row[c] for row in data),
+                                     dtype=np.float64, count=n)
+        except (TypeError, ValueError):
+            cols[name] = [str(row[c]) for row in data]
 
-    rows = []
-    for r in range(1, n_rows):
-        row = {}
-        for c in range(n_cols):
-            v = arr[r][c]
-            try:
-                row[headers[c]] = float(v)
-            except (TypeError, ValueError):
-                row[headers[c]] = str(v)
-        rows.append(row)
+    return cols
 
-    return rows
 
+def output_rows(cols):
+    """Re-materialize list-of-dict rows from the columnar layout.
 
-def b4b3_ratio(row):
-    L = row.get('m_B(OH)3(mol/kgw)',     0) or 0
-    M = row.get('m_B(OH)4-(mol/kgw)',    0) or 0
-    N = row.get('m_B3O3(OH)4-(mol/kgw)', 0) or 0
-    O = row.get('m_B4O5(OH)4-2(mol/kgw)',0) or 0
-    P = row.get('m_MgB(OH)4+(mol/kgw)',  0) or 0
-    Q = row.get('m_CaB(OH)4+(mol/kgw)',  0) or 0
-    num = M + P + Q + N + O + O    # SUM(M,P,Q,N,O,O)
-    den = L + N + N + O + O        # SUM(L,N,N,O,O)
-    return num / den if den > 1e-30 else 0.0
+    Only the debug/validation views need row dicts; the hot path works on
+    the columns directly.
+    """
+    series = [c.tolist() if isinstance(c, np.ndarray) else c for c in cols.values()]
+    return [dict(zip(cols, vals)) for vals in zip(*series)]
+
+
+def output_len(cols):
+    """Number of output rows in a columnar selected-output dict."""
+    return len(next(iter(cols.values()))) if cols else 0
+
+
+# Titration outputs longer than this route through the Numba kernel (when
+# numba is installed); below it the JIT warm-up outweighs the loop savings
+# and the NumPy ufunc path wins.
+_NUMBA_MIN_ROWS = 64
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def _b4b3_kernel(L, M, N, O, P, Q):    # pragma: no cover — needs numba
+        n = L.shape[0]
+        out = np.empty(n)
+        for i in range(n):
+            num = M[i] + P[i] + Q[i] + N[i] + 2.0 * O[i]
+            den = L[i] + 2.0 * N[i] + 2.0 * O[i]
+            out[i] = num / den if den > 1e-30 else 0.0
+        return out
+
+
+# Boron species columns feeding the B4/B3 ratio (output!L:Q)
+_B_SPECIES = (
+    'm_B(OH)3(mol/kgw)',
+    'm_B(OH)4-(mol/kgw)',
+    'm_B3O3(OH)4-(mol/kgw)',
+    'm_B4O5(OH)4-2(mol/kgw)',
+    'm_MgB(OH)4+(mol/kgw)',
+    'm_CaB(OH)4+(mol/kgw)',
+)
+_B_GETTER = operator.itemgetter(*_B_SPECIES)   # one C-level fetch of all six
+
+
+def b4b3_ratio(cols, idx=None):
+    """B4/B3 ratio for output rows in one shot (SoA batch math).
+
+    num = SUM(M,P,Q,N,O,O), den = SUM(L,N,N,O,O) — same cell formulas as
+    before, now as whole-column ufunc calls instead of six dict lookups
+    plus scalar arithmetic per row.  When idx (a row-index array) is
+    given, only those rows are computed — /calculate passes the NaOH
+    titration rows so the skipped i_soln/react scaffolding rows never
+    enter the arithmetic.
+    """
+    try:
+        series = _B_GETTER(cols)
+    except KeyError:
+        # Species absent from SELECTED_OUTPUT contribute zero to the sums
+        zeros = np.zeros(output_len(cols))
+        series = tuple(cols.get(k, zeros) for k in _B_SPECIES)
+    L, M, N, O, P, Q = (
+        np.ascontiguousarray(a if idx is None else np.asarray(a)[idx],
+                             dtype=np.float64)
+        for a in series
+    )
+    n = L.shape[0]
+    if numba is not None and n > _NUMBA_MIN_ROWS:
+        # Dense titrations: one LLVM-compiled pass instead of six ufunc sweeps
+        return _b4b3_kernel(L, M, N, O, P, Q)
+    num = M + P + Q + N + 2 * O
+    den = L + 2 * N + 2 * O
+    return np.divide(num, den, out=np.zeros(n), where=den > 1e-30)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # SHARED PAYLOAD PARSER
 # ─────────────────────────────────────────────────────────────────────────────
+ION_KEYS = ('Na', 'K', 'Li', 'Mg', 'Ca', 'SO4')
+MW_ARR   = np.array([Q3, Q4, Q5, Q6, Q7, Q8])   # hidden!Q3:Q8, ION_KEYS order
+# Positional indices into the ion array — ions travel as a fixed-order
+# float64 vector (SoA), not a dict, so downstream code indexes instead of
+# hashing six string keys per call and batch variants stack to (N, 6).
+NA, K, LI, MG, CA, SO4 = range(6)
+
+
 def parse_payload(d):
-    density  = float(d['density'])
-    tds      = float(d['tds'])
+    """Returns (water_mass, ion, hyd); ion is the hidden!C3:C8 mmol/kgw
+    vector in ION_KEYS order."""
+    # One bulk conversion for the numeric fields instead of eight float() calls
+    vals = np.fromiter((d[k] for k in ION_KEYS + ('density', 'tds')),
+                       dtype=np.float64, count=8)
+    density  = vals[6].item()
+    tds      = vals[7].item()
     tds_unit = d['tds_unit']
 
     # hidden!M10
     wm = calc_water_mass(density, tds, tds_unit)
 
-    # hidden!C3:C8  ion mmol/kgw
-    ion = {
-        'Na':  to_mmol_kgw(float(d['Na']),  Q3, wm),
-        'K':   to_mmol_kgw(float(d['K']),   Q4, wm),
-        'Li':  to_mmol_kgw(float(d['Li']),  Q5, wm),
-        'Mg':  to_mmol_kgw(float(d['Mg']),  Q6, wm),
-        'Ca':  to_mmol_kgw(float(d['Ca']),  Q7, wm),
-        'SO4': to_mmol_kgw(float(d['SO4']), Q8, wm),
-    }
+    # hidden!C3:C8  ion mmol/kgw — all six in one vector divide pair
+    ion = vals[:6] / wm / MW_ARR
 
     hyd = {
         'MgCl2':  d.get('hyd_MgCl2',  'Hexahydrate'),
@@ -497,103 +759,161 @@ def index():
     return render_template('index.html')
 
 
+def _canonical_payload(d):
+    """Hashable cache key for a request payload.
+
+    Numeric fields are rounded to 6 dp so float noise from the UI maps to
+    the same key; everything else is stringified.  Both endpoints are pure
+    functions of the payload, which makes this a safe cache key.
+    """
+    items = []
+    for k, v in sorted(d.items()):
+        try:
+            items.append((k, round(float(v), 6)))
+        except (TypeError, ValueError):
+            items.append((k, str(v)))
+    return tuple(items)
+
+
 @app.route('/recipe', methods=['POST'])
 def recipe_route():
     """Instant recipe — no PHREEQC, just the hidden sheet math."""
     try:
-        d = request.get_json()
-        wm, ion, hyd = parse_payload(d)
-        return jsonify({'recipe': build_recipe(ion, hyd), 'water_mass': round(wm, 6)})
+        return jsonify(_recipe_response(_canonical_payload(request.get_json())))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@functools.lru_cache(maxsize=512)
+def _recipe_response(payload_key):
+    d = dict(payload_key)
+    wm, ion, hyd = parse_payload(d)
+    return {'recipe': build_recipe(ion, hyd), 'water_mass': round(wm, 6)}
+
+
 @app.route('/calculate', methods=['POST'])
 def calculate():
     try:
-        d = request.get_json()
-        wm, ion, hyd = parse_payload(d)
-
-        # Add B and Br for display (not in recipe but shown in ion table)
-        ion_full = dict(ion)
-        ion_full['B']  = to_mmol_kgw(float(d['B']),  10.811, wm)
-        ion_full['Br'] = to_mmol_kgw(float(d['Br']), 79.904, wm)
-
-        params = {
-            'H3BO3_conc': float(d['H3BO3_conc']),
-            'H3BO3_vol':  float(d['H3BO3_vol']),
-            'sample_vol': float(d['sample_vol']),
-            'NaOH_conc':  float(d['NaOH_conc']),
-            'NaOH_vol':   float(d['NaOH_vol']),
-            'pH':         float(d.get('pH', 8.5)),
-        }
-
-        pqi, n_steps = build_phreeqc_input(ion, params, wm)
-        rows   = run_phreeqc(pqi)
-        recipe = build_recipe(ion, hyd)
-
-        step_ml = float(d['NaOH_vol']) / 20
-
-        # Map output rows to Excel structure:
-        #   row sim=1 i_soln  → initial DIW (skip — pH=7 not meaningful)
-        #   row sim=1 react   → REACTION 1: salts dissolved (skip)
-        #   row sim=2 react   → REACTION 2: H3BO3 added (skip)
-        #   row sim=3 step=1..20 → NaOH titration steps (SHOW THESE)
-        # Excel data!P10 = output!G4 = first NaOH step (sim=3 step=1)
-        # We identify NaOH rows by: state='react' AND step field increments 1..20
-
-        # Count react rows to skip first 2 (salts + H3BO3)
-        react_count = 0
-        titration   = []
-        naoh_vol    = 0.0
-        ionic_strength = None   # hidden!H25 → data!J13
-
-        for row in rows:
-            state = row.get('state', '')
-            pH    = row.get('pH')
-            ratio = b4b3_ratio(row)
-
-            if state == 'i_soln':
-                continue
-            elif state == 'react':
-                react_count += 1
-                if react_count == 1:
-                    # REACTION 1 = salts dissolved → this is output!row3
-                    # hidden!H25 = mu * mass_H2O / Volume  (mol/kgw → M)
-                    try:
-                        mu      = float(row.get('mu') or 0)
-                        mass_h2o = float(row.get('mass_H2O') or row.get('mass_h2o') or 1)
-                        volume  = float(row.get('Volume') or row.get('volume') or 1)
-                        ionic_strength = round(mu * mass_h2o / volume, 4)
-                    except (TypeError, ValueError):
-                        pass
-                if react_count <= 2:
-                    # Skip REACTION 1 (salts, 1 row) and REACTION 2 (H3BO3, 1 row)
-                    continue
-                # NaOH steps
-                naoh_vol = round(naoh_vol + step_ml, 8)
-                titration.append({
-                    'state':  'react',
-                    'V_NaOH': naoh_vol,
-                    'pH':     round(pH, 5) if pH is not None else None,
-                    'B4B3':   round(ratio, 7),
-                })
-
-        return jsonify({
-            'titration':      titration,
-            'recipe':         recipe,
-            'water_mass':     round(wm, 6),
-            'ion_mmol_kgw':   {k: round(v, 5) for k, v in ion_full.items()},
-            'n_steps':        n_steps,
-            'ionic_strength': ionic_strength,
-        })
-
+        return jsonify(_calculate_response(_canonical_payload(request.get_json())))
     except RuntimeError as e:
         return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
 
 
+@app.route('/calculate_batch', methods=['POST'])
+def calculate_batch():
+    """Parameter sweeps: a JSON list of /calculate payloads, solved in
+    parallel across the process pool.  Returns {'results': [...]} with one
+    /calculate-shaped dict (or {'error': ...}) per payload, input order."""
+    try:
+        payloads = request.get_json()
+        if not isinstance(payloads, list):
+            return jsonify({'error': 'expected a JSON list of payloads'}), 400
+        keys = [_canonical_payload(p) for p in payloads]
+        results = list(_get_pool().map(_solve_one, keys))
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
+
+
+@functools.lru_cache(maxsize=512)
+def _calculate_response(payload_key):
+    """Full titration response for one canonical payload.
+
+    Cached: interactive use re-submits identical payloads constantly, and
+    a hit skips the PHREEQC solve entirely.
+
+    The optional 'include' payload field trims the response:
+    'recipe' skips the PHREEQC solve outright (same payload as /recipe),
+    'titration' drops the recipe table, 'all' (default) returns both.
+    """
+    d = dict(payload_key)
+    mode = str(d.get('include', 'all'))
+    wm, ion, hyd = parse_payload(d)
+
+    if mode == 'recipe':
+        # Recipe-only callers don't need the solve at all
+        return {'recipe': build_recipe(ion, hyd), 'water_mass': round(wm, 6)}
+
+    # Add B and Br for display (not in recipe but shown in ion table);
+    # one vectorized rounding pass instead of eight scalar round() calls
+    ion_disp = np.round(
+        np.append(ion, (to_mmol_kgw(float(d['B']),  10.811, wm),
+                        to_mmol_kgw(float(d['Br']), 79.904, wm))), 5)
+
+    params = {
+        'H3BO3_conc': float(d['H3BO3_conc']),
+        'H3BO3_vol':  float(d['H3BO3_vol']),
+        'sample_vol': float(d['sample_vol']),
+        'NaOH_conc':  float(d['NaOH_conc']),
+        'NaOH_vol':   float(d['NaOH_vol']),
+        'pH':         float(d.get('pH', 8.5)),
+    }
+
+    pqi, n_steps, salts = build_phreeqc_input(ion, params, wm)
+    cols = run_phreeqc(pqi)
+
+    step_ml = float(d['NaOH_vol']) / 20
+
+    # Map output rows to Excel structure:
+    #   row sim=1 i_soln  → initial DIW (skip — pH=7 not meaningful)
+    #   row sim=1 react   → REACTION 1: salts dissolved (skip)
+    #   row sim=2 react   → REACTION 2: H3BO3 added (skip)
+    #   row sim=3 step=1..20 → NaOH titration steps (SHOW THESE)
+    # Excel data!P10 = output!G4 = first NaOH step (sim=3 step=1)
+    # We identify NaOH rows by: state='react', first two react rows skipped.
+
+    n_out  = output_len(cols)
+    state  = np.asarray(cols.get('state', [''] * n_out), dtype=object)
+    pH_col = np.asarray(cols.get('pH', np.zeros(n_out)))
+
+    react_idx = np.flatnonzero(state == 'react')
+
+    ionic_strength = None   # hidden!H25 → data!J13
+    if react_idx.size:
+        # REACTION 1 = salts dissolved → this is output!row3
+        # hidden!H25 = mu * mass_H2O / Volume  (mol/kgw → M)
+        i0 = react_idx[0]
+
+        def _cell(*names, default=0.0):
+            for name in names:
+                if name in cols:
+                    return cols[name][i0]
+            return default
+
+        try:
+            mu       = float(_cell('mu') or 0)
+            mass_h2o = float(_cell('mass_H2O', 'mass_h2o') or 1)
+            volume   = float(_cell('Volume', 'volume') or 1)
+            ionic_strength = round(mu * mass_h2o / volume, 4)
+        except (TypeError, ValueError):
+            pass
+
+    # NaOH steps: every react row past REACTION 1 (salts) + REACTION 2 (H3BO3)
+    tit_idx = react_idx[2:]
+    v_naoh  = np.round(step_ml * np.arange(1, tit_idx.size + 1), 8)
+    pH_tit  = np.round(pH_col[tit_idx], 5)
+    b4b3    = np.round(b4b3_ratio(cols, tit_idx), 7)
+
+    titration = [
+        {'state': 'react', 'V_NaOH': v, 'pH': p, 'B4B3': b}
+        for v, p, b in zip(v_naoh.tolist(), pH_tit.tolist(), b4b3.tolist())
+    ]
+
+    resp = {
+        'titration':      titration,
+        'water_mass':     round(wm, 6),
+        'ion_mmol_kgw':   dict(zip(ION_KEYS + ('B', 'Br'), ion_disp.tolist())),
+        'n_steps':        n_steps,
+        'ionic_strength': ionic_strength,
+    }
+    if mode != 'titration':
+        resp['recipe'] = recipe_from_salts(salts, hyd)
+    return resp
+
+
+
 @app.route('/show_input')
 def show_input():
     """Preview the PHREEQC input string at http://localhost:5000/show_input"""
@@ -608,7 +928,7 @@ def show_input():
     wm, ion, hyd = parse_payload(d)
     params = {k: float(d[k]) for k in
               ['H3BO3_conc','H3BO3_vol','sample_vol','NaOH_conc','NaOH_vol']}
-    pqi, n = build_phreeqc_input(ion, params, wm)
+    pqi, n, _salts = build_phreeqc_input(ion, params, wm)
     return (
         '<h2 style="font-family:monospace">PHREEQC Input Preview</h2>'
         f'<p style="font-family:monospace">water_mass = {wm:.6f} kgw/L &nbsp;|&nbsp; n_steps = {n}</p>'
@@ -618,9 +938,20 @@ def show_input():
 
 
 
+def _fmt_cell(v):
+    return f'{v:.6g}' if isinstance(v, float) else str(v)
+
+
 @app.route('/show_output')
 def show_output():
-    """Show raw PHREEQC output rows at /show_output — useful for validation"""
+    """Show raw PHREEQC output rows at /show_output — useful for validation.
+
+    Debug-only: 404 in production so deployed workers never run a second
+    PHREEQC solve just to build a diagnostic table.  Rows are streamed so
+    large outputs don't allocate the whole page before sending.
+    """
+    if not app.debug:
+        abort(404)
     d = {k: request.args.get(k, v) for k, v in {
         'Na':'2000','K':'5000','Li':'500','Mg':'20','Ca':'250',
         'SO4':'50','density':'1.3','tds':'350','tds_unit':'g/L',
@@ -633,26 +964,26 @@ def show_output():
     params = {k: float(d[k]) for k in
               ['H3BO3_conc','H3BO3_vol','sample_vol','NaOH_conc','NaOH_vol']}
     params['pH'] = float(d.get('pH', 8.5))
-    pqi, n = build_phreeqc_input(ion, params, wm)
-    rows = run_phreeqc(pqi)
-    html = ['<h2 style="font-family:monospace">PHREEQC Raw Output Rows</h2>']
-    html.append('<table border="1" style="font-family:monospace;font-size:11px;border-collapse:collapse">')
-    if rows:
-        html.append('<tr>' + ''.join(f'<th style="padding:3px 8px;background:#dce6f1">{k}</th>' for k in rows[0].keys()) + '</tr>')
-        for i, row in enumerate(rows):
-            bg = '#f2f7fc' if i % 2 else '#fff'
-            cells = []
-            for v in row.values():
-                fv = f'{v:.6g}' if isinstance(v, float) else str(v)
-                cells.append(f'<td style="padding:2px 8px;background:{bg}">{fv}</td>')
-            html.append('<tr>' + ''.join(cells) + '</tr>')
-    html.append('</table>')
-    return '\n'.join(html)
+    pqi, n, _salts = build_phreeqc_input(ion, params, wm)
+    rows = output_rows(run_phreeqc(pqi))
+
+    def gen():
+        yield '<h2 style="font-family:monospace">PHREEQC Raw Output Rows</h2>\n'
+        yield '<table border="1" style="font-family:monospace;font-size:11px;border-collapse:collapse">\n'
+        if rows:
+            yield ('<tr>' + ''.join(f'<th style="padding:3px 8px;background:#dce6f1">{k}</th>'
+                                    for k in rows[0].keys()) + '</tr>\n')
+            for i, row in enumerate(rows):
+                bg = '#f2f7fc' if i % 2 else '#fff'
+                yield ('<tr>' + ''.join(f'<td style="padding:2px 8px;background:{bg}">{_fmt_cell(v)}</td>'
+                                        for v in row.values()) + '</tr>\n')
+        yield '</table>'
+
+    return Response(stream_with_context(gen()), mimetype='text/html')
 
 @app.route('/debug')
 def debug():
     """IPhreeqc diagnostics at http://localhost:5000/debug"""
-    import os
     info = {}
     try:
         import phreeqpython
@@ -661,7 +992,6 @@ def debug():
         from phreeqpython import PhreeqPython
         db = find_database('pitzer.dat')
         info['pitzer_dat'] = db
-        import os
         info['pitzer_exists'] = os.path.isfile(db)
         pp = PhreeqPython(database=db)
         info['phreeqpython_init'] = 'OK'
@@ -694,4 +1024,16 @@ if __name__ == '__main__':
     print("  PHREEQC in:  http://localhost:5000/show_input")
     print("  Diagnostics: http://localhost:5000/debug")
     print("=" * 62)
-    app.run(debug=True, port=5000)
+    # Production runs behind gunicorn with gthread keep-alive (see start.sh).
+    # Locally, prefer waitress when installed: it reuses TCP connections
+    # across the UI's burst of small /recipe calls, unlike the Werkzeug dev
+    # server which closes the socket per request.  Debug stays off either
+    # way — the reloader double-forks the process and its debugger
+    # instruments every request, defeating the per-worker PhreeqPython
+    # singleton.  Concurrent solves are serialized by _PP_LOCK.
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(debug=False, threaded=True, port=5000)
+    else:
+        serve(app, host='0.0.0.0', port=5000, threads=max(4, os.cpu_count() or 1))
@@ -2,4 +2,10 @@
 set -e
 PORT="${PORT:-8080}"
 echo "Starting on port $PORT"
-exec gunicorn app:app --bind "0.0.0.0:$PORT" --workers 2 --timeout 120 --log-level info --access-logfile - --error-logfile -
+# Load the PHREEQC engine + pitzer.dat once per worker at boot instead of
+# on the first /calculate request (workers import app.py after the fork).
+export PHREEQC_PRELOAD=1
+# gthread workers reuse TCP connections (keep-alive) — the UI fires bursts of
+# small /recipe calls where connection setup otherwise dominates. PHREEQC
+# solves stay serialized per worker by the in-app engine lock.
+exec gunicorn app:app --bind "0.0.0.0:$PORT" --workers 2 --worker-class gthread --threads 4 --keep-alive 5 --timeout 120 --log-level info --access-logfile - --error-logfile -